@@ -1,7 +1,17 @@
+import hmac
+import os
+import re
+import secrets
+import sqlite3
+import time
+import uuid
+from contextvars import ContextVar
 from datetime import date, datetime
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+import anyio
 
 from fastapi import (
     Depends,
@@ -15,9 +25,11 @@ from fastapi import (
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.requests import Request
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.security import APIKeyHeader
-from pydantic import BaseModel, Field, HttpUrl, validator
+from fast_cache_middleware import CacheConfig, Controller, FastCacheMiddleware, InMemoryStorage
+from fast_cache_middleware.exceptions import NotFoundStorageError, TTLExpiredStorageError
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, TypeAdapter, field_validator
 from sqlalchemy import (
     Boolean,
     Column,
@@ -25,14 +37,21 @@ from sqlalchemy import (
     DateTime,
     Enum as SAEnum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     create_engine,
+    event,
     func,
+    select,
+    text,
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker, Session
+from sqlalchemy.orm import raiseload, relationship, scoped_session, selectinload, sessionmaker, Session
+from sqlalchemy.pool import NullPool, QueuePool
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -41,16 +60,57 @@ STATIC_DIR = BASE_DIR / "static"
 TEMPLATES_DIR = BASE_DIR / "templates"
 REVIEW_PHOTOS_DIR = STATIC_DIR / "review_photos"
 GALLERY_PHOTOS_DIR = STATIC_DIR / "gallery_photos"
+# Недописанные загрузки лежат вне /static, но на той же файловой системе, чтобы os.replace был атомарным
+UPLOAD_TMP_DIR = BASE_DIR / "upload_tmp"
+MAX_UPLOAD_SIZE = 10 << 20  # 10 МБ на один файл
+UPLOAD_CHUNK_SIZE = 1 << 20
 
 STATIC_DIR.mkdir(exist_ok=True)
 TEMPLATES_DIR.mkdir(exist_ok=True)
 REVIEW_PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
 GALLERY_PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_TMP_DIR.mkdir(exist_ok=True)
 
 
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Пул соединений переиспользуется между потоками FastAPI, если модуль sqlite3 это допускает
+if sqlite3.threadsafety >= 1:
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+else:
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=NullPool,
+    )
+
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL позволяет читать параллельно с записью, NORMAL сокращает количество fsync
+    cursor = dbapi_connection.cursor()
+    cursor.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA cache_size=-64000;"
+        "PRAGMA mmap_size=268435456;"
+        "PRAGMA foreign_keys=ON;"
+    )
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Сессия привязана к идентификатору запроса, а не к потоку пула
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+ScopedSession = scoped_session(SessionLocal, scopefunc=lambda: _request_id.get())
 Base = declarative_base()
 
 
@@ -83,6 +143,11 @@ class Review(Base):
     status = Column(SAEnum(ReviewStatus), default=ReviewStatus.pending, index=True)
     created_at = Column(DateTime, server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_reviews_place_status_created", place_id, status, created_at.desc()),
+        Index("ix_reviews_status_created", status, created_at.desc()),
+    )
+
     place = relationship("Place", back_populates="reviews")
     photos = relationship("ReviewPhoto", back_populates="review", cascade="all, delete-orphan")
 
@@ -106,14 +171,21 @@ class Event(Base):
     short_info = Column(String(255), nullable=False)
     cover_url = Column(String(500), nullable=True)
 
+    __table_args__ = (Index("ix_events_date", date),)
+
 
 class GallerySection(Base):
     __tablename__ = "gallery_sections"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False, unique=True, index=True)
 
-    photos = relationship("GalleryPhoto", back_populates="section", cascade="all, delete-orphan")
+    photos = relationship(
+        "GalleryPhoto",
+        back_populates="section",
+        cascade="all, delete-orphan",
+        order_by="GalleryPhoto.id",
+    )
 
 
 class GalleryPhoto(Base):
@@ -136,17 +208,64 @@ class Feedback(Base):
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    __table_args__ = (Index("ix_feedback_created", created_at.desc()),)
+
+
+def merge_duplicate_gallery_sections() -> None:
+    # Раньше названия разделов не были уникальными: фото переносим в раздел с наименьшим id, дубликаты удаляем
+    with engine.begin() as conn:
+        has_duplicates = conn.execute(
+            text("SELECT 1 FROM gallery_sections GROUP BY name HAVING COUNT(*) > 1 LIMIT 1")
+        ).first()
+        if not has_duplicates:
+            return
+        conn.execute(
+            text(
+                "UPDATE gallery_photos SET section_id = ("
+                " SELECT MIN(keep.id) FROM gallery_sections AS cur"
+                " JOIN gallery_sections AS keep ON keep.name = cur.name"
+                " WHERE cur.id = gallery_photos.section_id)"
+                " WHERE section_id IN (SELECT id FROM gallery_sections"
+                " WHERE id NOT IN (SELECT MIN(id) FROM gallery_sections GROUP BY name))"
+            )
+        )
+        conn.execute(
+            text("DELETE FROM gallery_sections WHERE id NOT IN (SELECT MIN(id) FROM gallery_sections GROUP BY name)")
+        )
+
 
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    merge_duplicate_gallery_sections()
+    # create_all не добавляет новые индексы к уже существующим таблицам
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+# Идентификаторы локаций держим в памяти, чтобы не делать SELECT на каждый новый отзыв
+_place_ids: Set[int] = set()
+
+
+def load_place_ids() -> None:
+    with SessionLocal() as db:
+        _place_ids.update(db.scalars(select(Place.id)))
+
+
+def default_load_opts() -> list:
+    # При STRICT_LOADING=1 незагруженные заранее связи вызывают ошибку вместо скрытого N+1
+    return [raiseload("*")] if os.getenv("STRICT_LOADING") else []
 
 
 def get_db():
-    db = SessionLocal()
+    request_id = uuid.uuid4().hex
+    _request_id.set(request_id)
     try:
-        yield db
+        yield ScopedSession()
     finally:
-        db.close()
+        # Завершение зависимости может выполняться в другом контексте, поэтому ключ выставляется заново
+        _request_id.set(request_id)
+        ScopedSession.remove()
 
 
 class PlaceOut(BaseModel):
@@ -157,8 +276,7 @@ class PlaceOut(BaseModel):
     lng: str
     description: Optional[str]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ReviewPhotoOut(BaseModel):
@@ -166,8 +284,7 @@ class ReviewPhotoOut(BaseModel):
     # Используем простую строку, т.к. в проекте храним относительные пути (/static/...)
     url: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ReviewOut(BaseModel):
@@ -179,8 +296,7 @@ class ReviewOut(BaseModel):
     created_at: datetime
     photos: List[ReviewPhotoOut] = []
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class EventOut(BaseModel):
@@ -190,8 +306,7 @@ class EventOut(BaseModel):
     short_info: str
     cover_url: Optional[HttpUrl]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class GalleryPhotoOut(BaseModel):
@@ -199,8 +314,7 @@ class GalleryPhotoOut(BaseModel):
     # Здесь также удобнее использовать строку, чтобы отдавать относительные URL без строгой валидации
     url: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class GallerySectionOut(BaseModel):
@@ -208,8 +322,7 @@ class GallerySectionOut(BaseModel):
     name: str
     photos: List[GalleryPhotoOut] = []
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FeedbackCreate(BaseModel):
@@ -226,8 +339,18 @@ class FeedbackOut(BaseModel):
     is_read: bool
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Списки ORM-объектов валидируются и сериализуются в JSON целиком внутри pydantic-core
+REVIEWS_TA = TypeAdapter(List[ReviewOut])
+EVENTS_TA = TypeAdapter(List[EventOut])
+GALLERY_TA = TypeAdapter(List[GallerySectionOut])
+
+
+def orm_list_response(adapter: TypeAdapter, rows) -> Response:
+    items = adapter.validate_python(rows, from_attributes=True)
+    return Response(adapter.dump_json(items, by_alias=True), media_type="application/json")
 
 
 class NavItem(BaseModel):
@@ -242,87 +365,221 @@ api_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
 
 
 async def require_admin(api_key: Optional[str] = Depends(api_key_header)) -> None:
-    if api_key != ADMIN_API_KEY:
+    if not api_key or not hmac.compare_digest(api_key.encode(), ADMIN_API_KEY.encode()):
         raise HTTPException(status_code=401, detail="Invalid or missing admin key")
 
 
+# Публичные справочные данные кэшируются в памяти процесса; изменения в админке сбрасывают кэш
+PUBLIC_CACHE = CacheConfig(max_age=60)
+CACHE_STORAGE = InMemoryStorage()
+# Префикс изменяющего запроса -> путь кэшированного списка, который нужно сбросить
+CACHE_DROP_RULES = (
+    ("/admin/places", re.compile("^/places")),
+    ("/admin/events", re.compile("^/events")),
+    ("/admin/gallery", re.compile("^/gallery")),
+    ("/gallery/upload", re.compile("^/gallery")),
+)
+# Счётчик сбросов по каждому шаблону: GET не сохраняет ответ, если за время его обработки был сброс
+CACHE_GENERATIONS: Dict[str, int] = {}
+
+
+def cache_generation(path: str) -> Tuple[int, ...]:
+    return tuple(
+        CACHE_GENERATIONS.get(pattern.pattern, 0) for _, pattern in CACHE_DROP_RULES if pattern.match(path)
+    )
+
+
+class GenerationAwareController(Controller):
+    async def generate_cache_key(self, request, cache_configuration) -> str:
+        # Поколение фиксируется до того, как обработчик прочитает данные из БД
+        request.scope["cache_generation"] = cache_generation(request.url.path)
+        return await super().generate_cache_key(request, cache_configuration)
+
+    async def get_cached_response(self, cache_key, storage):
+        # Промах — обычная ситуация, а библиотека 0.0.7 пишет его в лог с уровнем ERROR
+        try:
+            response, _, _ = await storage.get(cache_key)
+        except (NotFoundStorageError, TTLExpiredStorageError):
+            return None
+        return response
+
+    async def cache_response(self, cache_key, request, response, storage, ttl=None) -> None:
+        if request.scope.get("cache_generation") != cache_generation(request.url.path):
+            return
+        await super().cache_response(cache_key, request, response, storage, ttl)
+
+
+class SharedCacheMiddleware(FastCacheMiddleware):
+    # FastCacheMiddleware подменяет пустое (и потому ложное) хранилище своим, поэтому задаём его явно
+    def __init__(self, app, storage) -> None:
+        super().__init__(app, controller=GenerationAwareController())
+        self.storage = storage
+
+
+class CacheInvalidationMiddleware:
+    # Сбрасывает кэш только после успешного изменения, а не при входе запроса в приложение
+    def __init__(self, app, storage, rules) -> None:
+        self.app = app
+        self.storage = storage
+        self.rules = rules
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+        patterns = [pattern for prefix, pattern in self.rules if scope["path"].startswith(prefix)]
+        if not patterns:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_invalidate(message) -> None:
+            # Обработчик уже сделал commit к моменту начала ответа; сбрасываем до того, как клиент увидит успех.
+            # Увеличенное поколение не даёт параллельному GET, прочитавшему старые данные, сохранить их в кэш
+            if message["type"] == "http.response.start" and 200 <= message["status"] < 300:
+                for pattern in patterns:
+                    CACHE_GENERATIONS[pattern.pattern] = CACHE_GENERATIONS.get(pattern.pattern, 0) + 1
+                    await self.storage.delete(pattern)
+            await send(message)
+
+        await self.app(scope, receive, send_and_invalidate)
+
+
 app = FastAPI(
     title="CHEB-PLACE API",
     description="Цифровая карта молодежных пространств Чебоксар",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+# Кэш добавляется раньше CORS, чтобы CORS-заголовки не попадали в сохранённые ответы
+app.add_middleware(SharedCacheMiddleware, storage=CACHE_STORAGE)
+app.add_middleware(CacheInvalidationMiddleware, storage=CACHE_STORAGE, rules=CACHE_DROP_RULES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_credentials=False,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["X-Admin-Key", "Content-Type"],
+    max_age=86400,
 )
 
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+
+# Имена загруженных фото уникальны, поэтому браузер может кэшировать их навсегда
+class UploadsStaticFiles(StaticFiles):
+    IMMUTABLE_DIRS = (REVIEW_PHOTOS_DIR, GALLERY_PHOTOS_DIR)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if Path(full_path).parent in self.IMMUTABLE_DIRS:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+app.mount("/static", UploadsStaticFiles(directory=str(STATIC_DIR)), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
+# Страницы не содержат динамических данных, поэтому рендерим их один раз при запуске
+_PAGES = {
+    name: templates.get_template(name).render(request=None)
+    for name in ("index.html", "events.html", "gallery.html", "reviews.html", "contacts.html", "map.html")
+}
+
 
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
+    load_place_ids()
 
 
 @app.get("/", include_in_schema=False)
-async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+async def index():
+    return HTMLResponse(_PAGES["index.html"])
 
 
 @app.get("/index.html", include_in_schema=False)
-async def index_html(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+async def index_html():
+    return HTMLResponse(_PAGES["index.html"])
 
 
 @app.get("/events.html", include_in_schema=False)
-async def events_page(request: Request):
-    return templates.TemplateResponse("events.html", {"request": request})
+async def events_page():
+    return HTMLResponse(_PAGES["events.html"])
 
 
 @app.get("/gallery.html", include_in_schema=False)
-async def gallery_page(request: Request):
-    return templates.TemplateResponse("gallery.html", {"request": request})
+async def gallery_page():
+    return HTMLResponse(_PAGES["gallery.html"])
 
 
 @app.get("/reviews.html", include_in_schema=False)
-async def reviews_page(request: Request):
-    return templates.TemplateResponse("reviews.html", {"request": request})
+async def reviews_page():
+    return HTMLResponse(_PAGES["reviews.html"])
 
 
 @app.get("/contacts.html", include_in_schema=False)
-async def contacts_page(request: Request):
-    return templates.TemplateResponse("contacts.html", {"request": request})
+async def contacts_page():
+    return HTMLResponse(_PAGES["contacts.html"])
 
 
 @app.get("/map.html", include_in_schema=False)
-async def map_page(request: Request):
-    return templates.TemplateResponse("map.html", {"request": request})
+async def map_page():
+    return HTMLResponse(_PAGES["map.html"])
 
 
-@app.get("/nav", response_model=List[NavItem], tags=["Навигация"])
+_NAV = (
+    {"id": "home", "title": "Главная", "path": "/", "is_active": False},
+    {"id": "reviews", "title": "Отзывы", "path": "#reviews", "is_active": False},
+    {"id": "events", "title": "Мероприятия", "path": "#events", "is_active": False},
+    {"id": "gallery", "title": "Галерея", "path": "#gallery", "is_active": False},
+    {"id": "contacts", "title": "Контакты", "path": "#contacts", "is_active": False},
+)
+
+
+@app.get("/nav", response_model=List[NavItem], tags=["Навигация"], dependencies=[PUBLIC_CACHE])
 async def get_navigation(active: Optional[str] = Query(default=None, description="ID активной страницы")):
-    items = [
-        NavItem(id="home", title="Главная", path="/", is_active=False),
-        NavItem(id="reviews", title="Отзывы", path="#reviews", is_active=False),
-        NavItem(id="events", title="Мероприятия", path="#events", is_active=False),
-        NavItem(id="gallery", title="Галерея", path="#gallery", is_active=False),
-        NavItem(id="contacts", title="Контакты", path="#contacts", is_active=False),
-    ]
+    items = [dict(item) for item in _NAV]
     if active:
         for item in items:
-            if item.id == active:
-                item.is_active = True
+            if item["id"] == active:
+                item["is_active"] = True
     return items
 
 
-@app.get("/places", response_model=List[PlaceOut], tags=["Карта"])
+@app.get("/places", response_model=List[PlaceOut], tags=["Карта"], dependencies=[PUBLIC_CACHE])
 def list_places(db: Session = Depends(get_db)):
-    return db.query(Place).all()
+    # Все поля — строки и числа, поэтому отдаём строки выборки напрямую, минуя валидацию PlaceOut
+    rows = db.execute(
+        select(Place.id, Place.name, Place.category, Place.lat, Place.lng, Place.description)
+    ).mappings()
+    return ORJSONResponse([dict(row) for row in rows])
+
+
+def _save_upload(src: BinaryIO, path: Path, limit: int = MAX_UPLOAD_SIZE) -> None:
+    # Копируем файл блоками в рабочем потоке, не блокируя event loop и не превышая лимит размера
+    written = 0
+    try:
+        with open(path, "wb") as f:
+            while chunk := src.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > limit:
+                    raise HTTPException(status_code=413, detail="Файл слишком большой (максимум 10 МБ)")
+                f.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+
+async def _stage_upload(upload: UploadFile) -> tuple:
+    # Файл сначала пишется под временным именем и переименовывается только вместе с записью в БД
+    ext = Path(upload.filename or "").suffix or ".jpg"
+    tmp_path = UPLOAD_TMP_DIR / f"upload_{secrets.token_hex(8)}{ext}.tmp"
+    await anyio.to_thread.run_sync(_save_upload, upload.file, tmp_path)
+    return tmp_path, ext
+
+
+def _discard_files(paths: List[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
 
 
 @app.post("/reviews", status_code=201, tags=["Отзывы"])
@@ -334,35 +591,49 @@ async def create_review(
     files: Optional[List[UploadFile]] = File(None, description="До 5 фотографий"),
     db: Session = Depends(get_db),
 ):
-    place = db.query(Place).filter(Place.id == place_id).first()
-    if not place:
-        raise HTTPException(status_code=404, detail="Локация не найдена")
+    if place_id not in _place_ids:
+        # Локация могла быть добавлена другим воркером — проверяем по БД перед отказом
+        if not db.get(Place, place_id):
+            raise HTTPException(status_code=404, detail="Локация не найдена")
+        _place_ids.add(place_id)
 
     file_list = files or []
     if len(file_list) > 5:
         raise HTTPException(status_code=400, detail="Можно загрузить не более 5 изображений")
 
-    review = Review(
-        place_id=place_id,
-        author_name=author_name,
-        rating=rating,
-        text=text,
-        status=ReviewStatus.pending,
-    )
-    db.add(review)
-    db.flush()
-
-    for uploaded in file_list:
-        ext = Path(uploaded.filename or "").suffix or ".jpg"
-        filename = f"review_{review.id}_{datetime.utcnow().timestamp()}{ext}"
-        file_path = REVIEW_PHOTOS_DIR / filename
-        content = await uploaded.read()
-        file_path.write_bytes(content)
-        url = f"/static/review_photos/{filename}"
-        photo = ReviewPhoto(review_id=review.id, url=url)
-        db.add(photo)
+    staged = []
+    written: List[Path] = []
+    try:
+        for uploaded in file_list:
+            staged.append(await _stage_upload(uploaded))
+            written.append(staged[-1][0])
+
+        review = Review(
+            place_id=place_id,
+            author_name=author_name,
+            rating=rating,
+            text=text,
+            status=ReviewStatus.pending,
+        )
+        db.add(review)
+        db.flush()
 
-    db.commit()
+        photo_rows = []
+        renames = []
+        for tmp_path, ext in staged:
+            filename = f"review_{review.id}_{time.time_ns()}_{secrets.token_hex(4)}{ext}"
+            renames.append((tmp_path, REVIEW_PHOTOS_DIR / filename))
+            photo_rows.append({"review_id": review.id, "url": f"/static/review_photos/{filename}"})
+
+        if photo_rows:
+            db.bulk_insert_mappings(ReviewPhoto, photo_rows)
+        for tmp_path, final_path in renames:
+            os.replace(tmp_path, final_path)
+            written.append(final_path)
+        db.commit()
+    except BaseException:
+        _discard_files(written)
+        raise
     db.refresh(review)
 
     return {"id": review.id, "status": review.status}
@@ -375,21 +646,27 @@ def list_reviews(
 ):
     query = (
         db.query(Review)
+        .options(selectinload(Review.photos), *default_load_opts())
         .filter(Review.place_id == place_id, Review.status == ReviewStatus.approved)
         .order_by(Review.created_at.desc())
     )
-    return query.all()
+    return orm_list_response(REVIEWS_TA, query.all())
 
 
-@app.get("/events", response_model=List[EventOut], tags=["Мероприятия"])
+@app.get("/events", response_model=List[EventOut], tags=["Мероприятия"], dependencies=[PUBLIC_CACHE])
 def list_events(db: Session = Depends(get_db)):
-    return db.query(Event).order_by(Event.date.asc()).all()
+    return orm_list_response(EVENTS_TA, db.query(Event).order_by(Event.date.asc()).all())
 
 
-@app.get("/gallery", response_model=List[GallerySectionOut], tags=["Галерея"])
+@app.get("/gallery", response_model=List[GallerySectionOut], tags=["Галерея"], dependencies=[PUBLIC_CACHE])
 def get_gallery(db: Session = Depends(get_db)):
-    sections = db.query(GallerySection).all()
-    return sections
+    sections = (
+        db.query(GallerySection)
+        .options(selectinload(GallerySection.photos), *default_load_opts())
+        .order_by(GallerySection.id)
+        .all()
+    )
+    return orm_list_response(GALLERY_TA, sections)
 
 
 @app.post("/gallery/upload", tags=["Галерея"])
@@ -401,22 +678,26 @@ async def upload_gallery_photo(
     if not file.filename:
         raise HTTPException(status_code=400, detail="Файл не выбран")
 
-    section = db.query(GallerySection).filter(GallerySection.name == section_name).first()
-    if not section:
-        section = GallerySection(name=section_name)
-        db.add(section)
-        db.flush()
-
-    ext = Path(file.filename).suffix or ".jpg"
-    filename = f"gallery_{section.id}_{datetime.utcnow().timestamp()}{ext}"
-    file_path = GALLERY_PHOTOS_DIR / filename
-    content = await file.read()
-    file_path.write_bytes(content)
-    url = f"/static/gallery_photos/{filename}"
-
-    photo = GalleryPhoto(section_id=section.id, url=url)
-    db.add(photo)
-    db.commit()
+    tmp_path, ext = await _stage_upload(file)
+    written = [tmp_path]
+    try:
+        section_query = db.query(GallerySection).filter(GallerySection.name == section_name)
+        section = section_query.first()
+        if not section:
+            # Параллельная загрузка могла уже создать раздел — вставка просто игнорируется
+            db.execute(sqlite_insert(GallerySection).values(name=section_name).on_conflict_do_nothing())
+            section = section_query.first()
+
+        filename = f"gallery_{section.id}_{time.time_ns()}_{secrets.token_hex(4)}{ext}"
+        file_path = GALLERY_PHOTOS_DIR / filename
+        photo = GalleryPhoto(section_id=section.id, url=f"/static/gallery_photos/{filename}")
+        db.add(photo)
+        os.replace(tmp_path, file_path)
+        written.append(file_path)
+        db.commit()
+    except BaseException:
+        _discard_files(written)
+        raise
     db.refresh(photo)
 
     return {
@@ -443,17 +724,19 @@ def create_feedback(payload: FeedbackCreate, db: Session = Depends(get_db)):
 
 @app.get("/admin/reviews/pending", response_model=List[ReviewOut], tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_list_pending_reviews(db: Session = Depends(get_db)):
-    return (
+    reviews = (
         db.query(Review)
+        .options(selectinload(Review.photos), *default_load_opts())
         .filter(Review.status == ReviewStatus.pending)
         .order_by(Review.created_at.desc())
         .all()
     )
+    return orm_list_response(REVIEWS_TA, reviews)
 
 
 @app.post("/admin/reviews/{review_id}/approve", tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_approve_review(review_id: int, db: Session = Depends(get_db)):
-    review = db.query(Review).filter(Review.id == review_id).first()
+    review = db.get(Review, review_id)
     if not review:
         raise HTTPException(status_code=404, detail="Отзыв не найден")
     review.status = ReviewStatus.approved
@@ -472,10 +755,11 @@ class PlaceCreate(BaseModel):
 
 @app.post("/admin/places", response_model=PlaceOut, tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_create_place(payload: PlaceCreate, db: Session = Depends(get_db)):
-    place = Place(**payload.dict())
+    place = Place(**payload.model_dump())
     db.add(place)
     db.commit()
     db.refresh(place)
+    _place_ids.add(place.id)
     return place
 
 
@@ -485,7 +769,8 @@ class EventCreate(BaseModel):
     short_info: str = Field(..., max_length=255)
     cover_url: Optional[str]
 
-    @validator("short_info")
+    @field_validator("short_info")
+    @classmethod
     def validate_short_info(cls, v: str) -> str:
         if "\n" in v or "\r" in v:
             raise ValueError("Краткая информация должна быть в одну строку")
@@ -514,7 +799,11 @@ class GallerySectionCreate(BaseModel):
 def admin_create_gallery_section(payload: GallerySectionCreate, db: Session = Depends(get_db)):
     section = GallerySection(name=payload.name)
     db.add(section)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Раздел с таким названием уже существует")
     db.refresh(section)
     return section
 
@@ -527,7 +816,7 @@ class GalleryPhotoCreate(BaseModel):
 
 @app.post("/admin/gallery/photos", response_model=GalleryPhotoOut, tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_add_gallery_photo(payload: GalleryPhotoCreate, db: Session = Depends(get_db)):
-    section = db.query(GallerySection).filter(GallerySection.id == payload.section_id).first()
+    section = db.get(GallerySection, payload.section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Раздел галереи не найден")
     photo = GalleryPhoto(section_id=payload.section_id, url=payload.url)
@@ -545,7 +834,7 @@ def admin_list_events(db: Session = Depends(get_db)):
 
 @app.put("/admin/events/{event_id}", response_model=EventOut, tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_update_event(event_id: int, payload: EventCreate, db: Session = Depends(get_db)):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     event.title = payload.title
@@ -559,7 +848,7 @@ def admin_update_event(event_id: int, payload: EventCreate, db: Session = Depend
 
 @app.delete("/admin/events/{event_id}", tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_delete_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     db.delete(event)
@@ -569,18 +858,22 @@ def admin_delete_event(event_id: int, db: Session = Depends(get_db)):
 
 @app.put("/admin/gallery/sections/{section_id}", response_model=GallerySectionOut, tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_rename_gallery_section(section_id: int, payload: GallerySectionCreate, db: Session = Depends(get_db)):
-    section = db.query(GallerySection).filter(GallerySection.id == section_id).first()
+    section = db.get(GallerySection, section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Раздел галереи не найден")
     section.name = payload.name
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Раздел с таким названием уже существует")
     db.refresh(section)
     return section
 
 
 @app.delete("/admin/gallery/sections/{section_id}", tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_delete_gallery_section(section_id: int, db: Session = Depends(get_db)):
-    section = db.query(GallerySection).filter(GallerySection.id == section_id).first()
+    section = db.get(GallerySection, section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Раздел галереи не найден")
     db.delete(section)
@@ -590,7 +883,7 @@ def admin_delete_gallery_section(section_id: int, db: Session = Depends(get_db))
 
 @app.delete("/admin/gallery/photos/{photo_id}", tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_delete_gallery_photo(photo_id: int, db: Session = Depends(get_db)):
-    photo = db.query(GalleryPhoto).filter(GalleryPhoto.id == photo_id).first()
+    photo = db.get(GalleryPhoto, photo_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Фотография не найдена")
     db.delete(photo)
@@ -605,7 +898,7 @@ def admin_list_feedback(db: Session = Depends(get_db)):
 
 @app.post("/admin/feedback/{feedback_id}/mark_read", tags=["Админка"], dependencies=[Depends(require_admin)])
 def admin_mark_feedback_read(feedback_id: int, db: Session = Depends(get_db)):
-    fb = db.query(Feedback).filter(Feedback.id == feedback_id).first()
+    fb = db.get(Feedback, feedback_id)
     if not fb:
         raise HTTPException(status_code=404, detail="Сообщение не найдено")
     fb.is_read = True